@@ -36,9 +36,11 @@ OPTIONALS: Dict[str, Tuple[str, str]] = {
 
 def announce_defaults() -> None:
     """Log the effective value of each optional variable."""
+    env = dict(os.environ)  # one snapshot instead of per-var lookups
+    effective: Dict[str, str] = {}
     for var, (default, fmt) in OPTIONALS.items():
-        env_has_value = var in os.environ
-        val = os.getenv(var, default)
+        env_has_value = var in env
+        val = env.get(var, default)
 
         if env_has_value:
             log.info("%s set → " + fmt, var, val)
@@ -47,31 +49,40 @@ def announce_defaults() -> None:
         else:  # any other default
             log.info("%s defaulting to " + fmt, var, val)
 
-        os.environ[var] = val
+        effective[var] = val
 
+    os.environ.update(effective)
 
-announce_defaults()
 
-
-try:
-    ZoneInfo(os.environ["TIMEZONE"])
-except ZoneInfoNotFoundError:
-    log.warning("TIMEZONE '%s' invalid → falling back to UTC", os.environ["TIMEZONE"])
-    os.environ["TIMEZONE"] = "UTC"
+async def _announce_and_validate() -> None:
+    """Startup housekeeping that doesn't need to block the first poll."""
+    announce_defaults()
+    tz = os.environ["TIMEZONE"]
+    try:
+        ZoneInfo(tz)
+    except ZoneInfoNotFoundError:
+        log.warning("TIMEZONE '%s' invalid → falling back to UTC", tz)
+        os.environ["TIMEZONE"] = "UTC"
+        from .config import settings
+        settings.timezone = "UTC"
 
 
 REQUIRED_KEYS = ["DISCORD_WEBHOOK_URL"]
 REQUIRED_PREFIXES = ["MEGA_LINK_"]
 
-missing: list[str] = []
+_env = dict(os.environ)
 
-for key in REQUIRED_KEYS:
-    if not os.getenv(key):
-        missing.append(key)
+missing: list[str] = [key for key in REQUIRED_KEYS if not _env.get(key)]
 
-for pfx in REQUIRED_PREFIXES:
-    if not any(k.startswith(pfx) for k in os.environ):
-        missing.append(f"{pfx}*")
+_prefixes = tuple(REQUIRED_PREFIXES)
+prefix_hits = dict.fromkeys(REQUIRED_PREFIXES, False)
+for k in _env:
+    if k.startswith(_prefixes):
+        for pfx in REQUIRED_PREFIXES:
+            if k.startswith(pfx):
+                prefix_hits[pfx] = True
+
+missing.extend(f"{pfx}*" for pfx, hit in prefix_hits.items() if not hit)
 
 if missing:
     log.critical(
@@ -96,7 +107,11 @@ except ValidationError as exc:
 
 
 async def _main() -> None:
-    await run_monitor()
+    housekeeping = asyncio.create_task(_announce_and_validate())
+    try:
+        await run_monitor()
+    finally:
+        housekeeping.cancel()
 
 
 async def idle_until_signaled() -> None:
@@ -107,12 +122,10 @@ async def idle_until_signaled() -> None:
         try:
             loop.add_signal_handler(sig, stop.set)
         except NotImplementedError:
-            def _handler(signum, frame):
-                try:
-                    loop.call_soon_threadsafe(stop.set)
-                except RuntimeError:
-                    pass
-            signal.signal(sig, _handler)
+            # No loop-level signal support (e.g. Windows). signal.signal
+            # handlers run on the main thread — the same thread as the
+            # loop — so setting the event directly is safe.
+            signal.signal(sig, lambda *_: stop.set())
 
     await stop.wait()
 
@@ -1,15 +1,38 @@
 import re
 import json
 import base64
+import time
+import random
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
 from dataclasses import dataclass
 from typing import List, Dict, Tuple, Optional
-import requests
+import aiohttp
 import logging
 import os
 from Crypto.Cipher import AES
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+
+def _json_dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode()
+
+
+def _json_loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
 class MegaAPIError(Exception):
     def __init__(self, code: int, message: str):
         super().__init__(f"MEGA API error {code}: {message}")
@@ -29,6 +52,136 @@ class NoValidLinksError(ValueError):
         self.reports = reports
 
 
+_FOLDER_RE = re.compile(r"mega\.[^/]+/folder/([0-9A-Za-z_-]+)#([0-9A-Za-z_-]+)")
+_LEGACY_RE = re.compile(r"mega\.[^/]+/#F!([0-9A-Za-z_-]+)!([0-9A-Za-z_-]+)")
+_SANITIZE_RE = re.compile(r"[^A-Za-z0-9_-]")
+
+# The node-listing request body never varies, so encode it once at import.
+_GET_NODES_BODY = _json_dumps([{"a": "f", "c": 1, "ca": 1, "r": 1}])
+
+# Transient failures worth retrying with backoff before giving up.
+_MAX_TRIES = 5
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+_RETRY_MEGA_CODES = {-3, -4}  # EAGAIN, ERATELIMIT
+
+
+def _backoff_delay(
+    attempt: int,
+    retry_after: Optional[str] = None,
+    *,
+    base: float = 0.5,
+    cap: float = 30.0,
+) -> float:
+    """Exponential backoff with jitter, honoring a Retry-After header value."""
+    if retry_after:
+        try:
+            return min(cap, float(retry_after))
+        except ValueError:
+            pass
+    return min(cap, base * 2**attempt) + random.uniform(0, 0.25)
+
+
+class MegaLimiter:
+    """Client-side throttle for MEGA API calls.
+
+    Combines a token bucket (caps request rate) with an AIMD concurrency
+    window: additive increase after a window of successes, multiplicative
+    decrease whenever MEGA signals throttling (-3/-4 or HTTP 429/5xx), so
+    sustained polling backs off before the server starts rejecting.
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        cap: int = 16,
+        rate: float = 8.0,
+        alpha: float = 0.5,
+        beta: float = 0.5,
+    ):
+        self._limit = float(initial)
+        self._cap = cap
+        self._rate = rate  # requests per second sustained; burst == rate
+        self._alpha = alpha
+        self._beta = beta
+        self._tokens = rate
+        self._last_refill = time.monotonic()
+        self._in_flight = 0
+        self._successes = 0
+        self._cond: Optional[asyncio.Condition] = None
+        self._recent: deque = deque(maxlen=64)
+
+    def _condition(self) -> asyncio.Condition:
+        # Created lazily so the limiter can live at module level without
+        # binding to an event loop at import time.
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    def _take_token(self) -> float:
+        """Consume one token; return the delay to wait if over rate."""
+        now = time.monotonic()
+        self._tokens = min(self._rate, self._tokens + (now - self._last_refill) * self._rate)
+        self._last_refill = now
+        self._tokens -= 1.0
+        self._recent.append(now)
+        if self._tokens >= 0:
+            return 0.0
+        return -self._tokens / self._rate
+
+    def current_rps(self) -> float:
+        now = time.monotonic()
+        recent = [t for t in self._recent if now - t < 5.0]
+        return len(recent) / 5.0
+
+    async def acquire(self) -> None:
+        cond = self._condition()
+        async with cond:
+            await cond.wait_for(lambda: self._in_flight < int(self._limit))
+            self._in_flight += 1
+            delay = self._take_token()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def release(self, ok: bool) -> None:
+        cond = self._condition()
+        async with cond:
+            self._in_flight -= 1
+            if ok:
+                self._successes += 1
+                if self._successes >= int(self._limit):
+                    self._limit = min(self._cap, self._limit + self._alpha)
+                    self._successes = 0
+            else:
+                self._limit = max(1.0, self._limit * self._beta)
+                self._successes = 0
+                logger.debug(
+                    "MEGA throttle signal: concurrency window → %.1f (%.1f rps)",
+                    self._limit,
+                    self.current_rps(),
+                )
+            cond.notify_all()
+
+
+_limiter = MegaLimiter()
+
+
+# Short-lived cache of node listings per root, so the startup validation
+# fetch is reused by the first monitor poll instead of hitting MEGA twice.
+_NODE_CACHE_TTL = 30.0
+_NODE_CACHE: Dict[str, Tuple[float, List[Dict]]] = {}
+
+
+def _cached_nodes(root: str) -> Optional[List[Dict]]:
+    hit = _NODE_CACHE.get(root)
+    if hit and time.monotonic() - hit[0] < _NODE_CACHE_TTL:
+        logger.debug("Node cache hit for root %s", root)
+        return hit[1]
+    return None
+
+
+def _store_nodes(root: str, nodes: List[Dict]) -> None:
+    _NODE_CACHE[root] = (time.monotonic(), nodes)
+
 _ERROR_MAP = {
     -2: "EARGS: Invalid arguments",
     -3: "EAGAIN: Try again (temporary)",
@@ -50,24 +203,59 @@ def _decode_cs_error(first) -> Optional[int]:
     return None
 
 
-def get_mega_links() -> List[Dict[str, str]]:
+@functools.lru_cache(maxsize=1)
+def _raw_mega_env() -> Tuple[Tuple[str, str], ...]:
+    """Snapshot of MEGA_LINK_* env vars, scanned once per process."""
+    return tuple(
+        (k.removeprefix("MEGA_LINK_"), v)
+        for k, v in os.environ.items()
+        if k.startswith("MEGA_LINK_")
+    )
+
+
+async def get_mega_links_async() -> List[Dict[str, str]]:
     valid: List[Dict[str, str]] = []
     invalid: List[InvalidLinkReport] = []
+    entries: List[Tuple[str, str, str]] = []
 
-    for key, url in os.environ.items():
-        if not key.startswith("MEGA_LINK_"):
-            continue
-        name = key.removeprefix("MEGA_LINK_")
+    for name, url in _raw_mega_env():
         try:
             root, key_b64 = parse_folder_url(url)
-            _ = get_nodes(root)  # raises MegaAPIError for -9/-16 etc.
-            valid.append({"name": name, "url": url})
-        except MegaAPIError as e:
-            logger.warning("MEGA returned error %s for %s: %s", e.code, root, e.message)
-            invalid.append(InvalidLinkReport(name=name, url=url, code=e.code, reason=e.message))
         except Exception as e:
             logger.exception("Failed to validate %s", name)
             invalid.append(InvalidLinkReport(name=name, url=url, code=-1, reason=str(e)))
+            continue
+        entries.append((name, url, root))
+
+    # Live reachability checks block startup behind N round-trips and burn
+    # MEGA quota on every restart; the monitor loop already surfaces API
+    # errors via notify_unavailable, so by default only the URL shape is
+    # validated here. Set MEGA_STARTUP_VALIDATE=1 for the old behavior.
+    if os.getenv("MEGA_STARTUP_VALIDATE", "0") != "1":
+        valid = [{"name": name, "url": url} for name, url, _ in entries]
+        if not valid:
+            raise NoValidLinksError(invalid)
+        return valid
+
+    results: List = []
+    if entries:
+        timeout = aiohttp.ClientTimeout(total=30, sock_connect=3.05)
+        connector = aiohttp.TCPConnector(limit=16)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            results = await asyncio.gather(
+                *(get_nodes_async(session, root) for _, _, root in entries),
+                return_exceptions=True,
+            )
+
+    for (name, url, root), result in zip(entries, results):
+        if isinstance(result, MegaAPIError):
+            logger.warning("MEGA returned error %s for %s: %s", result.code, root, result.message)
+            invalid.append(InvalidLinkReport(name=name, url=url, code=result.code, reason=result.message))
+        elif isinstance(result, BaseException):
+            logger.error("Failed to validate %s: %s", name, result)
+            invalid.append(InvalidLinkReport(name=name, url=url, code=-1, reason=str(result)))
+        else:
+            valid.append({"name": name, "url": url})
 
     if not valid:
         raise NoValidLinksError(invalid)
@@ -75,18 +263,22 @@ def get_mega_links() -> List[Dict[str, str]]:
     return valid
 
 
+def get_mega_links() -> List[Dict[str, str]]:
+    return asyncio.run(get_mega_links_async())
+
+
 def sanitize(name: str) -> str:
-    return re.sub(r"[^A-Za-z0-9_-]", "_", name)
+    return _SANITIZE_RE.sub("_", name)
 
 
 def parse_folder_url(url: str) -> Tuple[str, str]:
     logger.debug("Parsing folder URL: %s", url)
-    match = re.search(r"mega\.[^/]+/folder/([0-9A-Za-z_-]+)#([0-9A-Za-z_-]+)", url)
+    match = _FOLDER_RE.search(url)
     if not match:
-        match = re.search(r"mega\.[^/]+/#F!([0-9A-Za-z_-]+)!([0-9A-Za-z_-]+)", url)
-        logger.debug("Parsed URL → root=%s key=%s", match.group(1), match.group(2))
+        match = _LEGACY_RE.search(url)
     if not match:
         raise ValueError(f"Invalid MEGA folder URL: {url}")
+    logger.debug("Parsed URL → root=%s key=%s", match.group(1), match.group(2))
     return match.group(1), match.group(2)
 
 
@@ -95,47 +287,74 @@ def base64_url_decode(data: str) -> bytes:
     return base64.urlsafe_b64decode(data)
 
 
-def base64_to_a32(data: str) -> Tuple[int, ...]:
-    raw = base64_url_decode(data)
-    return tuple(int.from_bytes(raw[i : i + 4], "big") for i in range(0, len(raw), 4))
+def decrypt_key(cipher: bytes, shared_key: bytes) -> bytes:
+    return AES.new(shared_key, AES.MODE_ECB).decrypt(cipher)
 
 
-def decrypt_key(
-    cipher: Tuple[int, ...], shared_key: Tuple[int, ...]
-) -> Tuple[int, ...]:
-    key_bytes = b"".join(x.to_bytes(4, "big") for x in shared_key)
-    cipher_bytes = b"".join(x.to_bytes(4, "big") for x in cipher)
-    aes = AES.new(key_bytes, AES.MODE_ECB)
-    plain = aes.decrypt(cipher_bytes)
-    return tuple(
-        int.from_bytes(plain[i : i + 4], "big") for i in range(0, len(plain), 4)
-    )
-
-
-def decrypt_attr(attr_bytes: bytes, key: Tuple[int, ...]) -> Dict:
-    aes_key = b"".join(x.to_bytes(4, "big") for x in key[:4])
-    aes = AES.new(aes_key, AES.MODE_CBC, iv=b"\0" * 16)
+def decrypt_attr(attr_bytes: bytes, key: bytes) -> Dict:
+    aes = AES.new(key[:16], AES.MODE_CBC, iv=b"\0" * 16)
     decrypted = aes.decrypt(attr_bytes)
-    text = decrypted.rstrip(b"\0").decode("utf-8", errors="ignore")
-    json_part = text[text.find("{") : text.rfind("}") + 1]
-    return json.loads(json_part)
+    # Attr payload is 'MEGA{...}' plus NUL padding — slice the JSON out of
+    # the raw bytes rather than decoding the whole padded buffer.
+    start = decrypted.find(b"{")
+    end = decrypted.rfind(b"}")
+    return _json_loads(decrypted[start : end + 1])
 
 
-def get_nodes(root: str) -> List[Dict]:
+async def get_nodes_async(session: aiohttp.ClientSession, root: str) -> List[Dict]:
+    cached = _cached_nodes(root)
+    if cached is not None:
+        return cached
     logger.debug("Fetching nodes for root %s", root)
-    resp = requests.post(
-        "https://g.api.mega.co.nz/cs",
-        params={"id": 0, "n": root},
-        data=json.dumps([{"a": "f", "c": 1, "ca": 1, "r": 1}]),
-        timeout=(3.05, 30),
-    )
-    try:
-        resp.raise_for_status()
-        payload = resp.json()
-    except Exception:
-        logger.exception("MEGA API error while fetching nodes for %s", root)
-        raise
+    for attempt in range(_MAX_TRIES):
+        await _limiter.acquire()
+        throttled = False
+        delay: Optional[float] = None
+        try:
+            try:
+                async with session.post(
+                    "https://g.api.mega.co.nz/cs",
+                    params={"id": 0, "n": root},
+                    data=_GET_NODES_BODY,
+                    headers={"Content-Type": "application/json"},
+                ) as resp:
+                    resp.raise_for_status()
+                    payload = _json_loads(await resp.read())
+                nodes = _parse_nodes_payload(payload)
+            except aiohttp.ClientResponseError as e:
+                throttled = e.status in _RETRY_STATUSES
+                if throttled and attempt < _MAX_TRIES - 1:
+                    retry_after = e.headers.get("Retry-After") if e.headers else None
+                    delay = _backoff_delay(attempt, retry_after)
+                    logger.warning(
+                        "MEGA returned HTTP %s for %s; retrying in %.1f s", e.status, root, delay
+                    )
+                else:
+                    logger.exception("MEGA API error while fetching nodes for %s", root)
+                    raise
+            except MegaAPIError as e:
+                throttled = e.code in _RETRY_MEGA_CODES
+                if throttled and attempt < _MAX_TRIES - 1:
+                    delay = _backoff_delay(attempt)
+                    logger.warning(
+                        "MEGA returned %s for %s; retrying in %.1f s", e.code, root, delay
+                    )
+                else:
+                    raise
+            except aiohttp.ClientError:
+                logger.exception("MEGA API error while fetching nodes for %s", root)
+                raise
+        finally:
+            # Release before any backoff sleep so the slot isn't held idle.
+            await _limiter.release(ok=not throttled)
+        if delay is not None:
+            await asyncio.sleep(delay)
+            continue
+        _store_nodes(root, nodes)
+        return nodes
 
+
+def _parse_nodes_payload(payload) -> List[Dict]:
     def _raise(code: int):
         msg = _ERROR_MAP.get(code, "Unknown error")
         raise MegaAPIError(code, msg)
@@ -163,11 +382,15 @@ def get_nodes(root: str) -> List[Dict]:
     )
 
 
-def decrypt_node(node: Dict, shared_key: Tuple[int, ...]) -> Dict:
+def decrypt_node(node: Dict, shared_key: bytes) -> Dict:
     enc = node["k"].split(":")[-1]
-    key = decrypt_key(base64_to_a32(enc), shared_key)
+    key = decrypt_key(base64_url_decode(enc), shared_key)
+    return _node_from_key(node, key)
+
+
+def _node_from_key(node: Dict, key: bytes) -> Dict:
     if node.get("t") == 0:
-        key = tuple(key[i] ^ key[i + 4] for i in range(4))
+        key = bytes(a ^ b for a, b in zip(key[:16], key[16:32]))
     attrs = decrypt_attr(base64_url_decode(node.get("a", "")), key)
     return {
         "h": node["h"],
@@ -178,17 +401,56 @@ def decrypt_node(node: Dict, shared_key: Tuple[int, ...]) -> Dict:
     }
 
 
+# pycryptodome releases the GIL during AES work, so batches of nodes can be
+# decrypted on separate cores. Small folders stay on the calling thread.
+_DECRYPT_BATCH = 64
+
+
+def decrypt_nodes(nodes: List[Dict], shared_key: bytes) -> List[Dict]:
+    def _decrypt_batch(batch: List[Dict]) -> List[Dict]:
+        # One ECB context and one decrypt call cover the whole batch's
+        # node keys (ECB has no chaining, so concatenation is safe);
+        # the plaintext is then sliced back per node.
+        ecb = AES.new(shared_key, AES.MODE_ECB)
+        ciphers = [base64_url_decode(n["k"].split(":")[-1]) for n in batch]
+        plain = ecb.decrypt(b"".join(ciphers))
+        out = []
+        offset = 0
+        for node, cipher in zip(batch, ciphers):
+            key = plain[offset : offset + len(cipher)]
+            offset += len(cipher)
+            out.append(_node_from_key(node, key))
+        return out
+
+    if len(nodes) <= _DECRYPT_BATCH:
+        return _decrypt_batch(nodes)
+
+    batches = [nodes[i : i + _DECRYPT_BATCH] for i in range(0, len(nodes), _DECRYPT_BATCH)]
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        return [d for batch in executor.map(_decrypt_batch, batches) for d in batch]
+
+
 def build_paths(nodes: List[Dict], root: str) -> List[Dict]:
     lookup = {n["h"]: n for n in nodes}
+    path_cache: Dict[str, str] = {root: ""}
 
-    def resolve(h: str) -> str:
-        if h == root or h not in lookup:
-            return ""
-        parent = resolve(lookup[h]["p"])
-        return f"{parent}/{lookup[h]['name']}" if parent else lookup[h]["name"]
+    for n in nodes:
+        h = n["h"]
+        if h in path_cache:
+            continue
+        # Walk up the parent chain until we hit a cached ancestor, then
+        # unwind, assigning each node's path exactly once.
+        stack = []
+        while h not in path_cache and h in lookup:
+            stack.append(h)
+            h = lookup[h]["p"]
+        for child in reversed(stack):
+            parent = path_cache.get(lookup[child]["p"], "")
+            name = lookup[child]["name"]
+            path_cache[child] = f"{parent}/{name}" if parent else name
 
     return [
-        {"h": n["h"], "path": resolve(n["h"]), "type": n["type"], "size": n.get("size")}
-        for n in nodes
-        if resolve(n["h"])
+        {"h": h, "path": path, "type": lookup[h]["type"], "size": lookup[h].get("size")}
+        for h, path in path_cache.items()
+        if path and h != root
     ]
@@ -1,21 +1,41 @@
 from __future__ import annotations
 import csv
+import functools
 import io
-import json
+import time
 import traceback
 from datetime import datetime
 from typing import Dict, Tuple, Optional, Union
 from zoneinfo import ZoneInfo
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import HTTPError
 from .config import settings
 from .state_manager import logger
-from .mega_client import sanitize
+from .mega_client import sanitize, _backoff_delay, _json_dumps, _MAX_TRIES, _RETRY_STATUSES
+
+# Keep-alive session for Discord: avoids a fresh TLS handshake per webhook.
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+_session.headers.update({"User-Agent": "mega-monitor"})
 
 SUPPRESS_EMBEDS = 1 << 2  # 4
 DEFAULT_TIMEOUT = (3.05, 30)
 FAST_TIMEOUT = (0.5, 2)
 
+_TS_FMT = "%B %d, %Y %I:%M:%S %p %Z"
+
+
+@functools.lru_cache(maxsize=4)
+def _zoneinfo(tz: str) -> ZoneInfo:
+    # Cached by name so the TIMEZONE→UTC fallback still takes effect.
+    return ZoneInfo(tz)
+
+
+def _timestamp() -> str:
+    return datetime.now(_zoneinfo(settings.timezone)).strftime(_TS_FMT)
+
+
 def format_mentions() -> str:
     return ' '.join(f"<@{uid}>" for uid in settings.mention_user_ids)
 
@@ -45,67 +65,88 @@ def post_webhook(
         payload["flags"] = flags
 
     timeout = FAST_TIMEOUT if fast else DEFAULT_TIMEOUT
-
-    try:
-        if files:
-            resp = requests.post(
-                settings.discord_webhook_url,
-                data={"payload_json": json.dumps(payload)},
-                files=files,
-                timeout=timeout,
-            )
-        else:
-            resp = requests.post(
-                settings.discord_webhook_url,
-                json=payload,  # JSON so flags are honored
-                timeout=timeout,
-            )
-        resp.raise_for_status()
-        return resp
-
-    except HTTPError as e:
-        status = e.response.status_code if e.response is not None else None
-
-        if status == 401:
-            logger.error("401 Unauthorized: Check DISCORD_WEBHOOK_URL.")
-        elif status == 403:
-            logger.error("403 Forbidden: Webhook has no permission to post in the channel.")
-        elif status == 404:
-            logger.error("404 Not Found: Webhook URL invalid/deleted.")
-        elif status == 429:
-            logger.warning("429 Too Many Requests: rate limited by Discord; try again next run.")
-        elif status and 400 <= status < 500:
-            logger.error("Client error %s: payload rejected. Check content/URL.", status)
-        elif status and 500 <= status < 600:
-            logger.error("Server error %s from Discord; will retry next cycle.", status)
-        else:
-            logger.exception("Unexpected HTTP error sending webhook.")
-        return None
-
-    except Exception:
-        logger.exception("Non-HTTP error sending webhook.")
-        return None
+    max_tries = 1 if fast else _MAX_TRIES  # no retries on startup/exit paths
+
+    for attempt in range(max_tries):
+        try:
+            if files:
+                resp = _session.post(
+                    settings.discord_webhook_url,
+                    data={"payload_json": _json_dumps(payload).decode()},
+                    files=files,
+                    timeout=timeout,
+                )
+            else:
+                resp = _session.post(
+                    settings.discord_webhook_url,
+                    json=payload,  # JSON so flags are honored
+                    timeout=timeout,
+                )
+            resp.raise_for_status()
+            return resp
+
+        except HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+
+            if status in _RETRY_STATUSES and attempt < max_tries - 1:
+                retry_after = e.response.headers.get("Retry-After") if e.response is not None else None
+                delay = _backoff_delay(attempt, retry_after)
+                logger.warning("Discord returned %s; retrying in %.1f s", status, delay)
+                time.sleep(delay)
+                continue
+
+            _log_http_error(status)
+            return None
+
+        except Exception:
+            logger.exception("Non-HTTP error sending webhook.")
+            return None
+
+    return None
+
+
+def _log_http_error(status: Optional[int]) -> None:
+    if status == 401:
+        logger.error("401 Unauthorized: Check DISCORD_WEBHOOK_URL.")
+    elif status == 403:
+        logger.error("403 Forbidden: Webhook has no permission to post in the channel.")
+    elif status == 404:
+        logger.error("404 Not Found: Webhook URL invalid/deleted.")
+    elif status == 429:
+        logger.warning("429 Too Many Requests: rate limited by Discord; try again next run.")
+    elif status and 400 <= status < 500:
+        logger.error("Client error %s: payload rejected. Check content/URL.", status)
+    elif status and 500 <= status < 600:
+        logger.error("Server error %s from Discord; will retry next cycle.", status)
+    else:
+        logger.exception("Unexpected HTTP error sending webhook.")
 
 # ---------------- convenience notifiers below ----------------
 
 def notify_discord(name: str, url: str, new_items: list, renamed_items: list, deleted_items: list):
+    if not (new_items or renamed_items or deleted_items):
+        # Nothing to report — skip the CSV build and the multipart upload.
+        logger.debug("No changes for %s; skipping webhook", name)
+        return
+
     parts = []
     if new_items: parts.append(f"{len(new_items)} New")
     if renamed_items: parts.append(f"{len(renamed_items)} Renamed")
     if deleted_items: parts.append(f"{len(deleted_items)} Deleted")
-    summary = " & ".join(parts) + " Item(s) Detected" if parts else "No Changes"
+    summary = " & ".join(parts) + " Item(s) Detected"
 
-    now = datetime.now(ZoneInfo(settings.timezone))
-    timestamp = now.strftime("%B %d, %Y %I:%M:%S %p %Z")
+    timestamp = _timestamp()
 
-    # CSV attachment
-    output = io.StringIO()
-    writer = csv.DictWriter(output, fieldnames=['Change','Path','Old Path','New Path','Size'])
-    writer.writeheader()
-    for f in new_items: writer.writerow({'Change':'NEW','Path':f['path'],'Size':f.get('size', "")})
-    for old,new in renamed_items: writer.writerow({'Change':'RENAMED','Old Path':old,'New Path':new})
-    for d in deleted_items: writer.writerow({'Change':'DELETED','Path':d['path']})
-    csv_data = output.getvalue()
+    # CSV attachment — written straight to bytes so Discord upload needs no re-encode
+    buf = io.BytesIO()
+    tw = io.TextIOWrapper(buf, encoding='utf-8', newline='', write_through=True)
+    writer = csv.writer(tw)
+    writer.writerow(('Change','Path','Old Path','New Path','Size'))
+    for f in new_items: writer.writerow(('NEW', f['path'], '', '', f.get('size', "")))
+    for old,new in renamed_items: writer.writerow(('RENAMED', '', old, new, ''))
+    for d in deleted_items: writer.writerow(('DELETED', d['path'], '', '', ''))
+    tw.flush()
+    csv_data = buf.getvalue()
 
     # Suppress embed for the URL
     content = f"[{name}]({url}) **{summary}** — {timestamp}"
@@ -124,9 +165,7 @@ def notify_discord(name: str, url: str, new_items: list, renamed_items: list, de
 
 def notify_error(name: str, exc: Exception):
     tb = traceback.format_exc()
-    now = datetime.now(ZoneInfo(settings.timezone))
-    timestamp = now.strftime("%B %d, %Y %I:%M:%S %p %Z")
-    content = f"[{name}] 🚨 Error — {timestamp}: {exc}"
+    content = f"[{name}] 🚨 Error — {_timestamp()}: {exc}"
     post_webhook(
         content,
         files={"file": (f"{sanitize(name)}_error.txt", tb, "text/plain")},
@@ -136,14 +175,10 @@ def notify_error(name: str, exc: Exception):
     logger.error("Error encountered in %s: %s", name, exc)
 
 def notify_unavailable(name: str, url: str, code: int, reason: str, *, fast: bool = False):
-    now = datetime.now(ZoneInfo(settings.timezone))
-    timestamp = now.strftime("%B %d, %Y %I:%M:%S %p %Z")
-    content = f"[{name}] ⚠️ Link unavailable — {timestamp}\nCode {code}: {reason}\n<{url}>"
+    content = f"[{name}] ⚠️ Link unavailable — {_timestamp()}\nCode {code}: {reason}\n<{url}>"
     post_webhook(content, flags=SUPPRESS_EMBEDS, fast=fast, prepend_mentions=True)
 
 def notify_startup_summary(reports, *, fast: bool = False):
-    now = datetime.now(ZoneInfo(settings.timezone))
-    ts = now.strftime("%B %d, %Y %I:%M:%S %p %Z")
-    lines = [f"• [{r.name}] code {r.code}: {r.reason}\n<{r.url}>" for r in reports]
-    content = f"⚠️ Startup blocked — {ts}\nNo valid MEGA links found. Details:\n" + "\n".join(lines)
+    body = "\n".join(f"• [{r.name}] code {r.code}: {r.reason}\n<{r.url}>" for r in reports)
+    content = f"⚠️ Startup blocked — {_timestamp()}\nNo valid MEGA links found. Details:\n{body}"
     post_webhook(content, flags=SUPPRESS_EMBEDS, fast=fast, prepend_mentions=True)
\ No newline at end of file
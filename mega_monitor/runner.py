@@ -4,15 +4,17 @@ import signal
 import time
 import logging
 
+import aiohttp
+
 from .config import settings
 from .mega_client import (
     parse_folder_url,
-    base64_to_a32,
-    get_nodes,
-    decrypt_node,
+    base64_url_decode,
+    get_nodes_async,
+    decrypt_nodes,
     build_paths,
     sanitize,
-    get_mega_links,
+    get_mega_links_async,
     MegaAPIError,
 )
 from .state_manager import load_previous_state, save_state
@@ -29,14 +31,14 @@ def _setup_signal_handlers(loop):
             pass
 
 
-async def monitor_folder(name: str, url: str, state_dir: Path):
+async def monitor_folder(session: aiohttp.ClientSession, name: str, url: str, state_dir: Path):
     start_ts = time.perf_counter()
     state_file = state_dir / f"{sanitize(name)}.json"
     try:
         root, key = parse_folder_url(url)
-        shared_key = base64_to_a32(key)
-        nodes = get_nodes(root)
-        all_nodes = [decrypt_node(n, shared_key) for n in nodes]
+        shared_key = base64_url_decode(key)
+        nodes = await get_nodes_async(session, root)
+        all_nodes = decrypt_nodes(nodes, shared_key)
         current = build_paths(all_nodes, root)
         previous = load_previous_state(state_file)
 
@@ -97,7 +99,7 @@ async def run_monitor():
     settings.state_dir.mkdir(parents=True, exist_ok=True)
 
     # load links
-    links = get_mega_links()
+    links = await get_mega_links_async()
     logger.info(
         "Starting monitor – %d folders, interval=%ds",
         len(links),
@@ -108,22 +110,27 @@ async def run_monitor():
     _setup_signal_handlers(loop)
 
     try:
-        while True:
-            # create tasks for each link
-            tasks = [
-                monitor_folder(link["name"], link["url"], settings.state_dir)
-                for link in links
-            ]
-            # run them concurrently
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            # log any errors
-            for res in results:
-                if isinstance(res, Exception):
-                    notify_error(getattr(res, "name", "Unknown"), res)
-            logger.info(
-                "Run completed — sleeping for %d s", settings.check_interval_seconds
-            )
-            await asyncio.sleep(settings.check_interval_seconds)
+        # one keep-alive session shared by every poll; get_nodes_async
+        # throttles each fetch through the shared MegaLimiter
+        timeout = aiohttp.ClientTimeout(total=30, sock_connect=3.05)
+        connector = aiohttp.TCPConnector(limit=16)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            while True:
+                # create tasks for each link
+                tasks = [
+                    monitor_folder(session, link["name"], link["url"], settings.state_dir)
+                    for link in links
+                ]
+                # run them concurrently
+                results = await asyncio.gather(*tasks, return_exceptions=True)
+                # log any errors
+                for res in results:
+                    if isinstance(res, Exception):
+                        notify_error(getattr(res, "name", "Unknown"), res)
+                logger.info(
+                    "Run completed — sleeping for %d s", settings.check_interval_seconds
+                )
+                await asyncio.sleep(settings.check_interval_seconds)
     except (asyncio.CancelledError, KeyboardInterrupt):
         logger.info("Shutdown requested, exiting monitor loop.")
     finally: